@@ -0,0 +1,288 @@
+"""Benchmark suite for the coherence stack (Cache, Bus and MainMemory).
+
+Run from the repository root:
+
+    python -m benchmarks.run                    # compare against the baselines
+    python -m benchmarks.run --save-baseline    # record a local timing baseline
+    python -m benchmarks.run --update-counters  # accept new coherence counters
+
+The coherence counters are deterministic, so they are committed and checked
+everywhere. Timings only mean something on the machine that recorded them, so
+they are compared against a git-ignored local baseline when one exists.
+
+Exits with status 1 when the coherence counters differ from the committed
+baseline or a workload is slower than the local baseline beyond the tolerance.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.workloads import WORKLOADS, generate
+from src.enums import BloodType
+from src.mesi_simulator import MESISimulator
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+TIMING_BASELINE_PATH = os.path.join(os.path.dirname(__file__), "timing_baseline.json")
+TIMING_METRICS = ("ops_per_sec", "p50_ns", "p95_ns", "p99_ns", "peak_kib")
+
+
+def build_simulator(config, seed):
+    """Creates a simulator with deterministic memory contents and quiet caches."""
+    simulator = MESISimulator(
+        config["memory_size"],
+        config["cache_size"],
+        config["n_caches"],
+        config["block_size"],
+    )
+    rng = random.Random(seed)
+    blood_types = list(BloodType)
+    simulator.main_memory.load(
+        [rng.choice(blood_types) for _ in range(config["memory_size"])]
+    )
+    for cache in simulator.caches:
+        cache.verbose = False
+    return simulator
+
+
+def run_ops(simulator, ops):
+    """Replays operations against the caches."""
+    caches = simulator.caches
+    for cache_index, is_write, address, blood_type in ops:
+        if is_write:
+            caches[cache_index].write(address, blood_type)
+        else:
+            caches[cache_index].read(address)
+
+
+def run_ops_timed(simulator, ops):
+    """Replays operations, returning the latency of each one in nanoseconds."""
+    caches = simulator.caches
+    clock = time.perf_counter_ns
+    latencies = []
+    for cache_index, is_write, address, blood_type in ops:
+        start = clock()
+        if is_write:
+            caches[cache_index].write(address, blood_type)
+        else:
+            caches[cache_index].read(address)
+        latencies.append(clock() - start)
+    return latencies
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def coherence_counters(simulator):
+    """Sums the cache counters of every hospital and adds the bus counters."""
+    counters = dict(simulator.bus.stats)
+    for cache in simulator.caches:
+        for name, value in cache.stats.items():
+            counters[name] = counters.get(name, 0) + value
+    return counters
+
+
+def benchmark(names, config, repeat):
+    """Measures throughput, latency, peak memory and coherence traffic of workloads.
+
+    Repeats go round-robin over the workloads, so that a slow spell of the
+    machine hits one repeat of several workloads instead of every repeat of one.
+    """
+    ops_by_name = {
+        name: generate(
+            name,
+            config["n_ops"],
+            config["memory_size"],
+            config["n_caches"],
+            config["block_size"],
+            seed=config["seed"],
+        )
+        for name in names
+    }
+
+    best = {}  # Fastest untimed run of each workload, in seconds
+    timed_runs = {name: [] for name in names}
+    counters = {}
+    for _ in range(repeat):
+        for name, ops in ops_by_name.items():
+            # Throughput: runs without per-operation timers
+            simulator = build_simulator(config, config["seed"])
+            start = time.perf_counter()
+            run_ops(simulator, ops)
+            elapsed = time.perf_counter() - start
+            best[name] = min(elapsed, best.get(name, elapsed))
+            counters[name] = coherence_counters(simulator)
+
+            simulator = build_simulator(config, config["seed"])
+            timed_runs[name].append(run_ops_timed(simulator, ops))
+
+    results = {}
+    for name, ops in ops_by_name.items():
+        # Latency: every run replays the same operations, so keeping the fastest
+        # time of each one filters out interference (scheduling, other processes)
+        # while keeping genuinely slow paths such as write-backs
+        latencies = sorted(map(min, zip(*timed_runs[name])))
+
+        # Peak memory is traced separately, since tracing slows everything down
+        simulator = build_simulator(config, config["seed"])
+        tracemalloc.start()
+        run_ops(simulator, ops)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            "ops_per_sec": round(len(ops) / best[name]),
+            "p50_ns": percentile(latencies, 0.50),
+            "p95_ns": percentile(latencies, 0.95),
+            "p99_ns": percentile(latencies, 0.99),
+            "peak_kib": round(peak / 1024, 1),
+            "counters": counters[name],
+        }
+    return results
+
+
+def compare_counters(name, result, expected):
+    """Differences between the coherence counters of a result and the baseline."""
+    differences = []
+    for counter in sorted(result["counters"].keys() | expected.keys()):
+        actual = result["counters"].get(counter)
+        if actual != expected.get(counter):
+            differences.append(
+                f"{name}: counter {counter} {actual} != {expected.get(counter)}"
+            )
+    return differences
+
+
+def compare_timings(name, result, baseline, tolerance):
+    """Returns human readable regressions of a result against its timing baseline."""
+    regressions = []
+    if result["ops_per_sec"] < baseline["ops_per_sec"] * (1 - tolerance):
+        regressions.append(
+            f"{name}: ops/sec {result['ops_per_sec']} < {baseline['ops_per_sec']}"
+        )
+    for metric in ("p99_ns", "peak_kib"):
+        if result[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {metric} {result[metric]} > {baseline[metric]}"
+            )
+    return regressions
+
+
+def load_baseline(path, config):
+    """Reads a baseline file, or returns None if it is missing or does not apply."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline["config"] != config:
+        print(f"{path} was recorded with a different configuration, skipping it.")
+        return None
+    return baseline
+
+
+def save_baseline(path, config, results):
+    """Writes results to a baseline file, keeping the workloads that were not run."""
+    baseline = load_baseline(path, config)
+    merged = {**baseline["results"], **results} if baseline else results
+    with open(path, "w") as baseline_file:
+        json.dump({"config": config, "results": merged}, baseline_file, indent=2)
+        baseline_file.write("\n")
+    print(f"Baseline saved to {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--workload", action="append", choices=sorted(WORKLOADS), dest="workloads"
+    )
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--memory-size", type=int, default=10000)
+    parser.add_argument("--cache-size", type=int, default=64)
+    parser.add_argument("--caches", type=int, default=4)
+    parser.add_argument("--block-size", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--timing-baseline", default=TIMING_BASELINE_PATH)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Record the timings as this machine's local baseline",
+    )
+    parser.add_argument(
+        "--update-counters",
+        action="store_true",
+        help="Record the coherence counters as the committed baseline",
+    )
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    config = {
+        "n_ops": args.ops,
+        "memory_size": args.memory_size,
+        "cache_size": args.cache_size,
+        "n_caches": args.caches,
+        "block_size": args.block_size,
+        "seed": args.seed,
+    }
+
+    baseline = None if args.update_counters else load_baseline(args.baseline, config)
+    timing_baseline = None
+    if not args.save_baseline:
+        timing_baseline = load_baseline(args.timing_baseline, config)
+
+    results = benchmark(args.workloads or list(WORKLOADS), config, args.repeat)
+    regressions = []
+    header = f"{'workload':<18} {'ops/sec':>10} {'p50 ns':>9} {'p95 ns':>9} "
+    print(header + f"{'p99 ns':>9} {'peak KiB':>9}")
+    for name, result in results.items():
+        print(
+            f"{name:<18} {result['ops_per_sec']:>10} {result['p50_ns']:>9} "
+            f"{result['p95_ns']:>9} {result['p99_ns']:>9} {result['peak_kib']:>9}"
+        )
+        print("    " + ", ".join(f"{k}={v}" for k, v in result["counters"].items()))
+
+        if baseline and name in baseline["results"]:
+            expected = baseline["results"][name]["counters"]
+            regressions.extend(compare_counters(name, result, expected))
+        if timing_baseline and name in timing_baseline["results"]:
+            expected = timing_baseline["results"][name]
+            regressions.extend(
+                compare_timings(name, result, expected, args.tolerance)
+            )
+
+    if timing_baseline is None and not args.save_baseline:
+        print("No local timing baseline; record one with --save-baseline.")
+
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"config": config, "results": results}, json_file, indent=2)
+    if args.save_baseline:
+        timings = {
+            name: {metric: result[metric] for metric in TIMING_METRICS}
+            for name, result in results.items()
+        }
+        save_baseline(args.timing_baseline, config, timings)
+    if args.update_counters:
+        counters = {
+            name: {"counters": result["counters"]} for name, result in results.items()
+        }
+        save_baseline(args.baseline, config, counters)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
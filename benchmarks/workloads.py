@@ -0,0 +1,108 @@
+import random
+from itertools import accumulate
+
+from src.enums import BloodType
+
+
+# Every generator returns a list of (cache index, is_write, address, blood type)
+# operations, generated up front so that generation is never timed.
+
+ALL_TYPES = list(BloodType)
+BAG_TYPES = [t for t in BloodType if t != BloodType.EMPTY]
+
+
+def other_hospital(n_caches, rng):
+    """Any hospital but hospital 0, when there is more than one."""
+    return 1 + rng.randrange(n_caches - 1) if n_caches > 1 else 0
+
+
+def uniform(n_ops, memory_size, n_caches, block_size, rng, write_ratio=0.3):
+    """Every hospital reads or writes uniformly random bags."""
+    return [
+        (
+            rng.randrange(n_caches),
+            rng.random() < write_ratio,
+            rng.randrange(memory_size),
+            rng.choice(ALL_TYPES),
+        )
+        for _ in range(n_ops)
+    ]
+
+
+def zipf(n_ops, memory_size, n_caches, block_size, rng, write_ratio=0.3, s=1.1):
+    """A few hot bags get most of the traffic (Zipf-distributed popularity)."""
+    # Popularity ranks are assigned to shuffled addresses so hot bags are spread out
+    addresses = list(range(memory_size))
+    rng.shuffle(addresses)
+    weights = (1 / (rank**s) for rank in range(1, memory_size + 1))
+    cum_weights = list(accumulate(weights))
+    hot = rng.choices(addresses, cum_weights=cum_weights, k=n_ops)
+    return [
+        (
+            rng.randrange(n_caches),
+            rng.random() < write_ratio,
+            address,
+            rng.choice(ALL_TYPES),
+        )
+        for address in hot
+    ]
+
+
+def producer_consumer(n_ops, memory_size, n_caches, block_size, rng, window=64):
+    """Hospital 0 donates bags that the other hospitals then read and use."""
+    ops = []
+    base = rng.randrange(0, max(1, memory_size - window))
+    while len(ops) < n_ops:
+        address = base + rng.randrange(window)
+        ops.append((0, True, address, rng.choice(BAG_TYPES)))
+        consumer = other_hospital(n_caches, rng)
+        ops.append((consumer, False, address, None))
+        ops.append((consumer, True, address, BloodType.EMPTY))
+    return ops[:n_ops]
+
+
+def false_sharing(n_ops, memory_size, n_caches, block_size, rng, n_blocks=4):
+    """Hospitals write different bags that live in the same few blocks."""
+    blocks = [
+        rng.randrange(memory_size // block_size) * block_size for _ in range(n_blocks)
+    ]
+    ops = []
+    for i in range(n_ops):
+        cache_index = i % n_caches
+        address = rng.choice(blocks) + cache_index % block_size
+        ops.append((cache_index, True, address, rng.choice(ALL_TYPES)))
+    return ops
+
+
+def audit_scan(n_ops, memory_size, n_caches, block_size, rng, write_ratio=0.05):
+    """One hospital audits the bank sequentially while the others keep working."""
+    ops = []
+    for i in range(n_ops):
+        if i % 4 == 0:
+            ops.append((0, False, (i // 4) % memory_size, None))
+        else:
+            ops.append(
+                (
+                    other_hospital(n_caches, rng),
+                    rng.random() < write_ratio,
+                    rng.randrange(memory_size),
+                    rng.choice(ALL_TYPES),
+                )
+            )
+    return ops
+
+
+WORKLOADS = {
+    "uniform": uniform,
+    "zipf": zipf,
+    "producer_consumer": producer_consumer,
+    "false_sharing": false_sharing,
+    "audit_scan": audit_scan,
+}
+
+
+def generate(name, n_ops, memory_size, n_caches, block_size, seed=0, **params):
+    """Generates the operations of a named workload, deterministically for a seed."""
+    return WORKLOADS[name](
+        n_ops, memory_size, n_caches, block_size, random.Random(seed), **params
+    )
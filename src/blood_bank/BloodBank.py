@@ -1,47 +1,178 @@
+import threading
+
 from src.mesi_simulator import MESISimulator
 from src.enums import BloodType
+from src.blood_bank.TransactionLog import TransactionLog
+from src.instrumentation import Instrumentation
 
 
 class BloodBank:
-    """Handles blood bank operations using the MESI protocol."""
+    """Handles blood bank operations using the MESI protocol.
+
+    Operations may be called from several threads: each one works on the
+    simulator under a lock, which is released while its log record is made
+    durable so that concurrent operations share the same fsync. An operation
+    only returns once its record is durable.
+    """
 
-    def __init__(self, simulator: MESISimulator):
+    def __init__(
+        self,
+        simulator: MESISimulator,
+        transaction_log: TransactionLog | None = None,
+        checkpoint_records: int = 4096,
+    ):
         self.mesi_simulator = simulator
+        self.transaction_log = transaction_log
+        self.checkpoint_records = checkpoint_records  # Log records between checkpoints
+        self.instrumentation: Instrumentation | None = None
+        self.lock = threading.Lock()  # Guards the simulator
 
     def use_blood(self, hospital_id: int, blood_id: int, required_blood_type: str):
         """Uses blood from a specified bag if it matches the needed type."""
         if required_blood_type == "E":
             return "You can't use blood from an empty bag!"
 
-        data = self.mesi_simulator.caches[hospital_id].read(blood_id)
-        available_blood = data.data[blood_id % 5]  # type: ignore
+        with self.lock:
+            data = self.mesi_simulator.caches[hospital_id].read(blood_id)
+            available_blood = data.data[blood_id % 5]  # type: ignore
+
+            if available_blood.value != required_blood_type:  # type: ignore
+                return "Blood requested is not available anymore."
 
-        if available_blood.value != required_blood_type:  # type: ignore
-            return "Blood requested is not available anymore."
+            sequence = None
+            if self.transaction_log:
+                sequence = self.transaction_log.log_use(hospital_id, blood_id)
+            self.mesi_simulator.caches[hospital_id].write(blood_id, BloodType("E"))
+            self._checkpoint_if_due()
 
-        self.mesi_simulator.caches[hospital_id].write(blood_id, BloodType("E"))
+        self._wait_durable(sequence)
         return "Transaction successful."
 
-    def request_blood(self, hospital_id: int, blood_id: int):
-        """Requests the type of blood in a specified bag."""
-        data = self.mesi_simulator.caches[hospital_id].read(blood_id)
-        blood_type = data.data[blood_id % 5].value  # type: ignore
+    def request_blood(
+        self,
+        hospital_id: int,
+        blood_id: int,
+        stale_ok: bool = False,
+        max_staleness: int | None = None,
+        fallback: bool = False,
+    ):
+        """Requests the type of blood in a specified bag.
+
+        With `stale_ok`, the answer comes from the hospital's local copy of the
+        block (even an invalidated one) without any coherence traffic, and says
+        how many updates that copy has missed. A coherent read is only done when
+        `fallback` is set and there is no local copy, or it is more than
+        `max_staleness` updates behind.
+        """
+        with self.lock:
+            if stale_ok:
+                cache = self.mesi_simulator.caches[hospital_id]
+                block, staleness = cache.peek(blood_id)
+                fresh_enough = max_staleness is None or staleness <= max_staleness
+                if block is not None and fresh_enough:
+                    blood_type = block.data[blood_id % 5].value  # type: ignore
+                    if staleness == 0:
+                        freshness = "local copy, up to date"
+                    else:
+                        freshness = f"local copy, {staleness} update(s) behind"
+
+                    if blood_type != "E":
+                        return (
+                            f"The type of the blood in bag {blood_id} is "
+                            f"{blood_type} ({freshness})."
+                        )
+                    return f"The bag number {blood_id} is empty ({freshness})."
 
-        if blood_type != "E":  # type: ignore
-            return f"The type of the blood in bag {blood_id} is {blood_type}."
-        return f"The bag number {blood_id} is empty."
+                if not fallback:
+                    if block is None:
+                        return f"There is no local copy of bag {blood_id}."
+                    return (
+                        f"The local copy of bag {blood_id} is {staleness} "
+                        "update(s) behind."
+                    )
+
+            data = self.mesi_simulator.caches[hospital_id].read(blood_id)
+            blood_type = data.data[blood_id % 5].value  # type: ignore
+
+            if blood_type != "E":  # type: ignore
+                return f"The type of the blood in bag {blood_id} is {blood_type}."
+            return f"The bag number {blood_id} is empty."
 
     def donate_blood(self, hospital_id: int, donated_blood_type: str):
         """Donates blood to an empty bag in the bank."""
-        empty_bag_address = self._find_empty_bag(hospital_id)
-        if empty_bag_address is None:
-            return "The bank is out of empty bags!"
+        with self.lock:
+            empty_bag_address = self._find_empty_bag(hospital_id)
+            if empty_bag_address is None:
+                return "The bank is out of empty bags!"
 
-        self.mesi_simulator.caches[hospital_id].write(
-            empty_bag_address, BloodType(donated_blood_type)
-        )
+            sequence = None
+            if self.transaction_log:
+                sequence = self.transaction_log.log_donation(
+                    hospital_id, empty_bag_address, BloodType(donated_blood_type)
+                )
+            self.mesi_simulator.caches[hospital_id].write(
+                empty_bag_address, BloodType(donated_blood_type)
+            )
+            self._checkpoint_if_due()
+
+        self._wait_durable(sequence)
         return f"Blood accepted at bag number {empty_bag_address}."
 
+    def inventory_summary(self):
+        """Bags of each blood type in the bank and in each hospital, in O(1).
+
+        The bank totals include changes still held in Modified cache lines. A
+        hospital's counts cover the bags in its valid (non-invalid) cache lines.
+        """
+        with self.lock:
+            inventory = self.mesi_simulator.main_memory.inventory
+            return {
+                "bank": {t: inventory[t.code] for t in BloodType},
+                "hospitals": [
+                    {t: cache.counts[t.code] for t in BloodType}
+                    for cache in self.mesi_simulator.caches
+                ],
+            }
+
+    def enable_instrumentation(
+        self, instrumentation: Instrumentation | None = None
+    ) -> Instrumentation:
+        """Records latency histograms per operation and per coherence phase."""
+        if self.instrumentation is not None:
+            return self.instrumentation
+
+        self.instrumentation = self.mesi_simulator.enable_instrumentation(
+            instrumentation
+        )
+        for operation in ("use_blood", "request_blood", "donate_blood"):
+            self.instrumentation.attach(self, operation, operation)
+        self.instrumentation.attach(self, "_find_empty_bag", "find_empty_bag")
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        """Stops recording latencies and restores the original methods."""
+        self.mesi_simulator.disable_instrumentation()
+        self.instrumentation = None
+
+    def checkpoint(self):
+        """Truncates the transaction log to an image of the bank's current contents."""
+        with self.lock:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        # Caller holds the lock, so no operation is halfway through the simulator
+        if self.transaction_log:
+            self.transaction_log.checkpoint(self.mesi_simulator.current_contents())
+
+    def _checkpoint_if_due(self):
+        log = self.transaction_log
+        if log and log.records >= self.checkpoint_records:
+            self._checkpoint()
+
+    def _wait_durable(self, sequence: int | None):
+        if sequence is not None:
+            self.transaction_log.wait_durable(sequence)  # type: ignore
+
     def _find_empty_bag(self, hospital_id: int):
         """Finds an empty bag address in the blood bank."""
         for addr in range(0, self.mesi_simulator.main_memory.n_lines, 5):
@@ -5,6 +5,8 @@ import tkinter.font as tkFont
 from src.enums import BloodType
 from src.mesi_simulator import MESISimulator
 from src.blood_bank.BloodBank import BloodBank
+from src.blood_bank.TransactionLog import TransactionLog
+from src.memory_view import MemoryView
 
 
 class OutputBox:
@@ -31,50 +33,84 @@ class OutputBox:
 class BloodBankGUI:
     """GUI class for the Blood Bank simulator using the MESI protocol."""
 
-    def __init__(self, simulator: MESISimulator):
-        self.blood_bank = BloodBank(simulator)
+    def __init__(
+        self, simulator: MESISimulator, transaction_log: TransactionLog | None = None
+    ):
+        self.blood_bank = BloodBank(simulator, transaction_log)
         self.main_memory = simulator.main_memory
         self.caches = simulator.caches
         self.MAIN_MEMORY_SIZE = simulator.main_memory.n_lines
         self.tables = []
+        self.memory_view = None
+        self.cache_rows = {}  # Row ids of the cache table, by block address
         self.processor_map = {f"Hospital {i + 1}": i for i in range(len(self.caches))}
         self.output = OutputBox()
         self.root = tk.Tk()
         self.root.title("Blood Bank Simulator")
         self.setup_ui()
 
-    def refresh_tables(self):
-        """Refreshes the data displayed in the tables."""
-        for table in self.tables:
-            table.delete(*table.get_children())
-
-        # Populate main memory table
-        for i in range(self.MAIN_MEMORY_SIZE):
-            tag = "lightgray" if i % 10 >= 5 else "fixed"
-            self.tables[0].insert(
-                "", "end", values=(i, self.main_memory.data[i]), tags=(tag,)
-            )
+    def rebuild_tables(self):
+        """Fills the tables from scratch with the current data."""
+        self.main_memory.track_changes()
+        self.memory_view.render()
+        self.rebuild_cache_table()
+
+    def rebuild_cache_table(self):
+        """Fills the cache table with the blocks of the selected hospital."""
+        self.tables[1].delete(*self.tables[1].get_children())
+        self.cache_rows = {}
 
-        # Populate cache table for the selected hospital
         active_hospital = self.processor_map[self.hospital_combobox.get()]
-        for addr in reversed(self.caches[active_hospital].queue):
-            data = " | ".join(
-                [str(v) for v in self.caches[active_hospital].data[addr].data]
-            )
-            self.tables[1].insert(
-                "",
-                "end",
-                values=(addr, data, self.caches[active_hospital].data[addr].tag.value),
-                tags=("fixed",),
+        cache = self.caches[active_hospital]
+        for addr in reversed(cache.queue):
+            self.cache_rows[addr] = self.tables[1].insert(
+                "", "end", values=self.cache_row_values(cache, addr), tags=("fixed",)
             )
+        # Only the hospital on screen needs its changes recorded
+        for i, other in enumerate(self.caches):
+            other.track_changes(i == active_hospital)
+
+    def refresh_tables(self):
+        """Updates only the rows whose data changed since the last refresh."""
+        self.memory_view.refresh(self.main_memory.take_dirty())
+
+        active_hospital = self.processor_map[self.hospital_combobox.get()]
+        cache = self.caches[active_hospital]
+        changed = cache.take_dirty()
+        if not changed:
+            return
+
+        for addr in changed:
+            if addr not in cache.data:
+                if addr in self.cache_rows:
+                    self.tables[1].delete(self.cache_rows.pop(addr))
+            elif addr in self.cache_rows:
+                self.tables[1].item(
+                    self.cache_rows[addr], values=self.cache_row_values(cache, addr)
+                )
+            else:
+                self.cache_rows[addr] = self.tables[1].insert(
+                    "", 0, values=self.cache_row_values(cache, addr), tags=("fixed",)
+                )
+
+        # Keep the newest blocks on top, as in the FIFO queue
+        self.tables[1].set_children(
+            "", *[self.cache_rows[addr] for addr in reversed(cache.queue)]
+        )
+
+    def cache_row_values(self, cache, addr):
+        """Returns the values shown in the cache table for a block."""
+        block = cache.data[addr]
+        return (addr, " | ".join([str(v) for v in block.data]), block.tag.value)
 
     def use_blood(self):
         """Handles the use blood action."""
         hospital = self.processor_map[self.hospital_combobox.get()]
-        selected_item = self.tables[0].selection()[0]
-        values = self.tables[0].item(selected_item, "values")
-        blood_id = int(values[0])
-        blood_type = values[1].strip()
+        blood_id = self.memory_view.selected_address()
+        if blood_id is None:
+            self.output.write("Select a bag in the blood bank first.\n\n")
+            return
+        blood_type = str(self.main_memory.data[blood_id]).strip()
 
         self.output.write(
             f"Hospital {hospital + 1} trying to use blood {blood_type} from bag {blood_id}.\n"
@@ -98,9 +134,10 @@ class BloodBankGUI:
     def request_blood(self):
         """Handles the request blood action."""
         hospital = self.processor_map[self.hospital_combobox.get()]
-        selected_item = self.tables[0].selection()[0]
-        values = self.tables[0].item(selected_item, "values")
-        blood_id = int(values[0])
+        blood_id = self.memory_view.selected_address()
+        if blood_id is None:
+            self.output.write("Select a bag in the blood bank first.\n\n")
+            return
 
         self.output.write(
             f"Hospital {hospital + 1} requesting the blood type from bag number {blood_id}.\n"
@@ -153,27 +190,25 @@ class BloodBankGUI:
         tk.Label(table_frame, text="Blood Bank").grid(
             row=0, column=0, sticky="n", padx=(15, 0)
         )
-        memory_table = ttk.Treeview(
-            table_frame, columns=("Col1", "Col2"), show="headings", height=40
-        )
-        memory_table.heading("Col1", text="Address")
-        memory_table.heading("Col2", text="Type")
-        memory_table.column("Col1", width=80, anchor="center")
-        memory_table.column("Col2", width=80, anchor="center")
-        memory_table.grid(
-            row=0, column=0, rowspan=2, sticky="nswe", padx=(10, 0), pady=(25, 5)
+        self.memory_view = MemoryView(
+            table_frame,
+            self.main_memory,
+            self.caches,
+            value_heading="Type",
+            height=38,
+            striped=True,
+            font=fixed_font,
         )
-        memory_table.tag_configure("lightgray", background="#d3d3d3")
-        memory_table.tag_configure("fixed", font=fixed_font)
-        self.tables.append(memory_table)
-
-        memory_scrollbar = tk.Scrollbar(
-            table_frame, orient="vertical", command=memory_table.yview
-        )
-        memory_scrollbar.grid(
-            row=0, column=1, rowspan=2, padx=(0, 5), pady=(25, 5), sticky="ns"
+        self.memory_view.frame.grid(
+            row=0,
+            column=0,
+            columnspan=2,
+            rowspan=2,
+            sticky="nswe",
+            padx=(10, 5),
+            pady=(25, 5),
         )
-        memory_table.configure(yscrollcommand=memory_scrollbar.set)
+        self.tables.append(self.memory_view.table)
 
         # Cache table for the selected hospital
         active_hospital = self.processor_map[self.hospital_combobox.get()]
@@ -199,7 +234,7 @@ class BloodBankGUI:
 
         def on_combobox_change(event):
             cache_table_label.config(text=f"{self.hospital_combobox.get()} Cache")
-            self.refresh_tables()
+            self.rebuild_cache_table()
 
         self.hospital_combobox.bind("<<ComboboxSelected>>", on_combobox_change)
 
@@ -230,7 +265,7 @@ class BloodBankGUI:
         console.configure(yscrollcommand=console_scrollbar.set)
         self.output.attach_text_box(console)
 
-        self.refresh_tables()
+        self.rebuild_tables()
 
     def mainloop(self):
         """Starts the main loop of the Tkinter application."""
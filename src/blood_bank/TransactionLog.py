@@ -0,0 +1,256 @@
+import os
+import struct
+import threading
+import time
+
+from src.components import MainMemory
+from src.enums import BloodType, BLOOD_TYPES_BY_CODE
+from src.mesi_simulator import LINE_CODES, LINES_BY_CODE, VALID_LINE_CODES
+
+
+# Log layout: header, base image (bag count, then one line code per bag; an
+# empty image means the log starts from the current main memory), then records
+LOG_HEADER = b"BBWAL2\n"
+BASE_HEADER = struct.Struct("<I")
+# Operation code, hospital id, bag address, blood type code
+RECORD = struct.Struct("<BHIB")
+
+OP_USE = 1
+OP_DONATE = 2
+
+
+class TransactionLog:
+    """Append-only write-ahead log of blood bank operations with group commit.
+
+    `append` writes a record and returns its sequence number; `wait_durable`
+    blocks until that record is on stable storage. A lone record is fsynced
+    right away, while records appended concurrently (during another fsync, for
+    instance) share a single fsync. When other records are already waiting, the
+    batch is held open for up to `group_commit_ms` milliseconds or until it
+    holds `group_commit_records` records, so that more records can join it.
+
+    The log starts with a base image of the bank; `checkpoint` replaces it with
+    a new image and drops the records before it, which keeps the log bounded.
+    """
+
+    def __init__(self, path, group_commit_records=64, group_commit_ms=5):
+        if group_commit_records < 1:
+            raise ValueError("group_commit_records must be at least 1.")
+        if group_commit_ms < 0:
+            raise ValueError("group_commit_ms must not be negative.")
+
+        self.path = os.fspath(path)
+        self.group_commit_records = group_commit_records
+        self.group_commit_ms = group_commit_ms
+
+        self.written = 0  # Sequence number of the last appended record
+        self.durable = 0  # Sequence number of the last fsynced record
+        self.committing = False  # Whether a thread is fsyncing a batch
+        self.lock = threading.Condition()
+
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(LOG_HEADER + BASE_HEADER.pack(0))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            records_start = self.file.tell()
+        else:
+            with open(path, "rb") as log:
+                try:
+                    records_start = read_base(log.read(), path)[1]
+                except ValueError:
+                    self.file.close()
+                    raise
+
+            # Drop a torn record left by a crash so new records stay aligned
+            torn = (self.file.tell() - records_start) % RECORD.size
+            if torn:
+                self.file.truncate(self.file.tell() - torn)
+                self.file.seek(0, os.SEEK_END)
+
+        # Records logged since the base image
+        self.records = (self.file.tell() - records_start) // RECORD.size
+
+    def log_use(self, hospital_id: int, address: int) -> int:
+        """Records that a hospital emptied the bag at `address`."""
+        return self.append(OP_USE, hospital_id, address, BloodType.EMPTY)
+
+    def log_donation(
+        self, hospital_id: int, address: int, blood_type: BloodType
+    ) -> int:
+        """Records that a hospital stored a donation at `address`."""
+        return self.append(OP_DONATE, hospital_id, address, blood_type)
+
+    def append(
+        self, op: int, hospital_id: int, address: int, blood_type: BloodType
+    ) -> int:
+        """Appends a record without waiting for it, returning its sequence number."""
+        record = RECORD.pack(op, hospital_id, address, blood_type.code)
+        with self.lock:
+            self.file.write(record)
+            self.written += 1
+            self.records += 1
+            return self.written
+
+    def wait_durable(self, sequence: int):
+        """Blocks until the record with the given sequence number is fsynced."""
+        with self.lock:
+            deadline = None
+            while self.durable < sequence:
+                if self.committing:
+                    # Our record may be in the batch being fsynced, or the next one
+                    self.lock.wait()
+                    continue
+
+                # Hold a batch open only when other records are already waiting
+                batch = self.written - self.durable
+                if 1 < batch < self.group_commit_records and self.group_commit_ms:
+                    if deadline is None:
+                        deadline = time.monotonic() + self.group_commit_ms / 1000
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        self.lock.wait(remaining)
+                        continue
+                self._commit_locked()
+
+    def sync(self):
+        """Forces every appended record to stable storage."""
+        with self.lock:
+            while self.committing:
+                self.lock.wait()
+            if self.durable < self.written:
+                self._commit_locked()
+
+    def _commit_locked(self):
+        """Fsyncs every record written so far on behalf of the waiting appenders.
+
+        The lock is released during the fsync so that new records can be
+        appended to the next batch in the meantime.
+        """
+        batch_end = self.written
+        self.file.flush()
+        self.committing = True
+        self.lock.release()
+        try:
+            os.fsync(self.file.fileno())
+        finally:
+            self.lock.acquire()
+            self.committing = False
+            self.lock.notify_all()
+        self.durable = batch_end
+
+    def checkpoint(self, contents: list[BloodType | None]):
+        """Replaces the log with a base image of the bank, dropping every record.
+
+        `contents` must be the current contents of every bag, including changes
+        still held in Modified cache lines (see `MESISimulator.current_contents`),
+        so the caller must keep operations from changing the bank meanwhile
+        (`BloodBank.checkpoint` holds its lock). Records still waiting for
+        `wait_durable` are committed first. The new log is written next to the
+        old one and renamed over it, so a crash leaves one of them intact.
+        """
+        image = bytes(map(LINE_CODES.__getitem__, contents))
+        with self.lock:
+            while self.committing:
+                self.lock.wait()
+            if self.durable < self.written:
+                self._commit_locked()
+
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "wb") as log:
+                log.write(LOG_HEADER + BASE_HEADER.pack(len(image)) + image)
+                log.flush()
+                os.fsync(log.fileno())
+
+            self.file.close()
+            os.replace(temporary_path, self.path)
+            if os.name == "posix":
+                # Make the rename itself durable
+                directory = os.open(os.path.dirname(os.path.abspath(self.path)), 0)
+                try:
+                    os.fsync(directory)
+                finally:
+                    os.close(directory)
+
+            self.file = open(self.path, "ab")
+            self.records = 0
+
+    def close(self):
+        """Commits pending records and closes the log."""
+        with self.lock:
+            if self.file.closed:
+                return
+            while self.committing:
+                self.lock.wait()
+            self._commit_locked()
+            self.file.close()
+
+    @staticmethod
+    def replay(path, main_memory: MainMemory) -> int:
+        """Restores main memory from a log and returns the number of records.
+
+        The base image replaces the whole main memory, then the records logged
+        after it are bulk-applied. Writes go straight into main memory without
+        coherence traffic, so replay must happen before the caches are
+        populated. A partially written record at the end of the log (from a
+        crash mid-append) is ignored.
+        """
+        with open(path, "rb") as log:
+            raw = log.read()
+
+        base, records_start = read_base(raw, path)
+        if base.translate(None, VALID_LINE_CODES):
+            raise ValueError(f"{path} has an unknown line code in its base image.")
+        if base:
+            main_memory.load(list(map(LINES_BY_CODE.__getitem__, base)))
+
+        body = memoryview(raw)[records_start:]
+        body = body[: len(body) - len(body) % RECORD.size]
+
+        # Only the last write to each bag matters
+        writes = {}
+        count = 0
+        for _, _, address, code in RECORD.iter_unpack(body):
+            if code >= len(BLOOD_TYPES_BY_CODE):
+                raise ValueError(f"{path} has a record with an unknown blood type.")
+            writes[address] = BLOOD_TYPES_BY_CODE[code]
+            count += 1
+
+        main_memory.apply_writes(writes)
+        return count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_base(raw: bytes, path) -> tuple[bytes, int]:
+    """Returns the base image of a log and the offset of its first record."""
+    if not raw.startswith(LOG_HEADER):
+        raise ValueError(f"{path} is not a blood bank transaction log.")
+    if len(raw) < len(LOG_HEADER) + BASE_HEADER.size:
+        raise ValueError(f"{path} has a truncated base image.")
+
+    (n_lines,) = BASE_HEADER.unpack_from(raw, len(LOG_HEADER))
+    base_start = len(LOG_HEADER) + BASE_HEADER.size
+    if len(raw) < base_start + n_lines:
+        raise ValueError(f"{path} has a truncated base image.")
+    return raw[base_start : base_start + n_lines], base_start + n_lines
+
+
+def open_transaction_log(path, main_memory: MainMemory, **group_commit):
+    """Recovers main memory from a log (or starts a new one) and opens it.
+
+    An existing log replaces main memory with its base image plus the records
+    after it, so anything `populate_main_memory` wrote is discarded; a new log
+    takes the current main memory as its base. Either way the log is then
+    checkpointed down to a single base image. Must be called after
+    `populate_main_memory` and before `populate_caches`.
+    """
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        TransactionLog.replay(path, main_memory)
+    log = TransactionLog(path, **group_commit)
+    log.checkpoint(main_memory.data)
+    return log
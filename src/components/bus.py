@@ -1,10 +1,14 @@
-from src.enums import SnoopResponse
+from src.enums import MESITag, SnoopMessage, SnoopResponse
 
 # Represents the bus that connects multiple caches and the main memory
 class Bus:
     def __init__(self, main_memory):
         self.caches = []  # List of caches attached to the bus
         self.main_memory = main_memory  # Reference to the main memory
+        # Coherence traffic counters: broadcasts per message, write-backs, memory reads
+        self.stats = {message.value: 0 for message in SnoopMessage}
+        self.stats["write_backs"] = 0
+        self.stats["memory_reads"] = 0
 
     # Attach a cache to the bus
     def attach_cache(self, cache):
@@ -12,6 +16,7 @@ class Bus:
 
     # Broadcast a message to all caches except the sender
     def broadcast(self, message, address, sender) -> SnoopResponse:
+        self.stats[message.value] += 1
         responses = []  # Collect responses from caches
         for cache in self.caches:
             if cache != sender:  # Do not send the message back to the sender
@@ -24,8 +29,32 @@ class Bus:
 
     # Write data back to the main memory
     def write_back(self, address, data):
-        self.main_memory.write(address, data)
+        self.stats["write_backs"] += 1
+        self.main_memory.write_back(address, data)
 
     # Read data from the main memory
     def read_from_main(self, address):
+        self.stats["memory_reads"] += 1
         return self.main_memory.read(address)
+
+    # Current version of a block, without any coherence traffic
+    def block_version(self, address):
+        return self.main_memory.block_version(address)
+
+    # Record that a cache updated a block
+    def bump_version(self, address):
+        return self.main_memory.bump_version(address)
+
+    # Record that a cache replaced a bag of type `previous` with one of type `value`
+    def record_update(self, previous, value):
+        self.main_memory.record_update(previous, value)
+
+    # Add the changes held in modified blocks to the inventory (after a restore)
+    def recount_inventory(self):
+        for cache in self.caches:
+            for block_index, block in cache.data.items():
+                if block.tag == MESITag.M:
+                    memory = self.main_memory.read(block_index)
+                    for previous, value in zip(memory, block.data):
+                        if previous is not value:
+                            self.record_update(previous, value)
@@ -1,12 +1,14 @@
 from src.components import Bus
+from src.components.main_memory import count_replacement
 from src.enums import BloodType, MESITag, SnoopMessage, SnoopResponse
 
 
 # Represents a single cache block
 class CacheBlock:
-    def __init__(self, tag, data):
+    def __init__(self, tag, data, version=0):
         self.tag: MESITag = tag  # MESI tag (Modified, Exclusive, Shared, Invalid)
         self.data: list[BloodType | None] = list(data)  # Data stored in the cache block
+        self.version = version  # Block version this copy reflects
 
     def __str__(self) -> str:
         # String representation of the cache block
@@ -22,9 +24,24 @@ class Cache:
         self.current_lines = 0  # Current number of blocks in the cache
         self.queue = []  # FIFO queue for managing block eviction
         self.data: dict[int, CacheBlock] = {}  # Mapping of addresses to cache blocks
+        # Blocks changed since the last take_dirty, None unless a view tracks them
+        self.dirty: set[int] | None = None
 
         self.bus: Bus = bus  # Bus for communication with main memory and other caches
 
+        # Bags of each blood type held in valid (non-invalid) blocks
+        self.counts: list[int] = [0] * len(BloodType)  # Indexed by BloodType code
+
+        self.verbose = True  # Print hits and misses
+        # Access and eviction counters (snoop lookups are not counted)
+        self.stats = {
+            "read_hits": 0,
+            "read_misses": 0,
+            "write_hits": 0,
+            "write_misses": 0,
+            "evictions": 0,
+        }
+
     # Calculate the block index based on the address
     def calculate_block_index(self, address):
         return address - (address % self.block_size)
@@ -46,36 +63,56 @@ class Cache:
         # Handle cache miss if the block is not found or invalid
         return self.handle_cache_miss(address, block_index, to_write)
 
+    # Look up the local copy of a block without any coherence traffic, returning
+    # it (even if invalid) with the number of updates it has missed
+    def peek(self, address) -> tuple[CacheBlock | None, int]:
+        block = self.data.get(self.calculate_block_index(address))
+        if block is None:
+            return None, 0
+        return block, self.bus.block_version(address) - block.version
+
     # Handle a cache hit
     def handle_cache_hit(self, to_write, is_local):
         if not is_local:
             if to_write:
-                print("Write Hit!")
+                self.stats["write_hits"] += 1
+                if self.verbose:
+                    print("Write Hit!")
             else:
-                print("Read Hit!")
+                self.stats["read_hits"] += 1
+                if self.verbose:
+                    print("Read Hit!")
 
     # Handle a cache miss, either for read or write
     def handle_cache_miss(self, address, block_index, to_write) -> CacheBlock:
         if to_write:
-            print("Write Miss!")
+            self.stats["write_misses"] += 1
+            if self.verbose:
+                print("Write Miss!")
             response = self.broadcast_message(
                 SnoopMessage.READ_WITH_INTENT_TO_MODIFY, block_index
             )
         else:
-            print("Read Miss!")
+            self.stats["read_misses"] += 1
+            if self.verbose:
+                print("Read Miss!")
             response = self.broadcast_message(SnoopMessage.READ, block_index)
 
         # Fetch the block from main memory
         block_from_main = self.bus.read_from_main(block_index)
         # Set tag based on snoop response
         tag = MESITag.S if response == SnoopResponse.SHARED else MESITag.E
-        new_block = CacheBlock(tag, block_from_main)
+        version = self.bus.block_version(block_index)
+        new_block = CacheBlock(tag, block_from_main, version)
 
-        # Update existing block or add a new one
+        # Update existing (invalid) block or add a new one
         if block_index in self.data:
             self.data[block_index] = new_block
+            if self.dirty is not None:
+                self.dirty.add(block_index)
         else:
             self.add_block_to_cache(block_index, new_block)
+        self.adjust_counts(new_block.data, 1)
 
         return new_block
 
@@ -87,14 +124,23 @@ class Cache:
         self.data[block_index] = new_block
         self.queue.append(block_index)
         self.current_lines += 1
+        if self.dirty is not None:
+            self.dirty.add(block_index)
 
     # Evict the oldest block from the cache
     def evict_block(self):
         removed_addr = self.queue.pop(0)  # Remove the oldest block
-        # Write the evicted block back to main memory
-        self.bus.write_back(removed_addr, self.data[removed_addr].data)
+        removed = self.data[removed_addr]
+        # Only a modified block differs from main memory and must be written back
+        if removed.tag == MESITag.M:
+            self.bus.write_back(removed_addr, removed.data)
+        if removed.tag != MESITag.I:
+            self.adjust_counts(removed.data, -1)
         del self.data[removed_addr]
         self.current_lines -= 1
+        self.stats["evictions"] += 1
+        if self.dirty is not None:
+            self.dirty.add(removed_addr)
 
     # Write data to the cache
     def write(self, address, data):
@@ -106,11 +152,17 @@ class Cache:
 
         # Write the data to the block at the position corresponding to the address
         index = address % self.block_size
+        previous = block.data[index]  # type: ignore
         block.data[index] = data  # type: ignore
+        count_replacement(self.counts, previous, data)
+        self.bus.record_update(previous, data)
         block.tag = MESITag.M  # Mark the block as modified # type: ignore
+        block.version = self.bus.bump_version(address)  # type: ignore
 
         block_index = self.calculate_block_index(address)
         self.data[block_index] = block  # type: ignore
+        if self.dirty is not None:
+            self.dirty.add(block_index)
 
         return 0  # Return 0 to indicate success
 
@@ -135,10 +187,14 @@ class Cache:
         if block.tag == MESITag.M:
             self.bus.write_back(address, block.data)
             self.data[block_index].tag = MESITag.S
+            if self.dirty is not None:
+                self.dirty.add(block_index)
             return SnoopResponse.SHARED
 
         if block.tag == MESITag.E:
             self.data[block_index].tag = MESITag.S
+            if self.dirty is not None:
+                self.dirty.add(block_index)
 
         return SnoopResponse.SHARED
 
@@ -147,11 +203,11 @@ class Cache:
         if not block or block.tag == MESITag.I:
             return SnoopResponse.OK
 
+        # A modified block is written back first, then invalidated like any other
         if block.tag == MESITag.M:
             self.bus.write_back(address, block.data)
-            return SnoopResponse.OK
 
-        self.data[block_index].tag = MESITag.I
+        self.invalidate_block(block_index)
         return SnoopResponse.OK
 
     # Handle an INVALIDATE snoop message
@@ -159,9 +215,42 @@ class Cache:
         if not block or block.tag == MESITag.I:
             return SnoopResponse.OK
 
-        self.data[block_index].tag = MESITag.I
+        self.invalidate_block(block_index)
         return SnoopResponse.OK
 
+    # Mark a valid block as invalid
+    def invalidate_block(self, block_index):
+        block = self.data[block_index]
+        block.tag = MESITag.I
+        self.adjust_counts(block.data, -1)
+        if self.dirty is not None:
+            self.dirty.add(block_index)
+
+    # Add (sign=1) or remove (sign=-1) bags from the per-type counts
+    def adjust_counts(self, values, sign):
+        counts = self.counts
+        for value in values:
+            if value is not None:
+                counts[value.code] += sign
+
+    # Recompute the per-type counts from the valid blocks (after a restore)
+    def recount(self):
+        self.counts = [0] * len(BloodType)
+        for block in self.data.values():
+            if block.tag != MESITag.I:
+                self.adjust_counts(block.data, 1)
+
+    # Start recording changed blocks for take_dirty, or stop recording
+    def track_changes(self, enabled=True):
+        self.dirty = set() if enabled else None
+
+    # Return the blocks changed since the last call and start a new set
+    def take_dirty(self) -> set[int]:
+        if self.dirty is None:
+            raise RuntimeError("Change tracking is off; call track_changes first.")
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
     # Send a message via the bus
     def broadcast_message(self, message, address) -> SnoopResponse:
         return self.bus.broadcast(message, address, self)  # type: ignore
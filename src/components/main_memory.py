@@ -1,11 +1,30 @@
 from src.enums import BloodType
 
 
+def count_replacement(counts, previous, value) -> None:
+    # Count a bag of type `previous` being replaced by one of type `value` in a
+    # list of per-type counts indexed by BloodType code
+    if previous is not None:
+        counts[previous.code] -= 1
+    if value is not None:
+        counts[value.code] += 1
+
+
 class MainMemory:
     def __init__(self, n_lines, block_size) -> None:
         self.n_lines = n_lines
         self.block_size = block_size
         self.data: list[BloodType | None] = [None for _ in range(n_lines)]
+        # Addresses written since the last take_dirty, None unless a view tracks them
+        self.dirty: set[int] | None = None
+        # Number of updates to each block, compared against cached copies
+        self.versions: list[int] = [0] * -(-n_lines // block_size)
+        # Bags of each blood type in the bank, indexed by BloodType code. Cache
+        # writes report their changes through record_update, so this includes
+        # lines still modified in a cache; write-backs leave it unchanged
+        self.inventory: list[int] = [0] * len(BloodType)
+        # Addresses holding each blood type, built on first use by type_index
+        self.addresses_by_type: dict[BloodType, set[int]] | None = None
 
     def read(self, address) -> list[BloodType | None]:
         if address >= self.n_lines:
@@ -22,7 +41,89 @@ class MainMemory:
         block_index = address - (address % self.block_size)
         for i in range(self.block_size):
             if (block_index + i) < self.n_lines:
-                self.data[block_index + i] = data[i]
+                self.set_line(block_index + i, data[i])
+
+    def write_back(self, address, data) -> None:
+        # Store a block written back by a cache; its changes are already counted
+        if address >= self.n_lines:
+            raise IndexError("Line number exceeds the total number of lines.")
+
+        block_index = address - (address % self.block_size)
+        end = min(block_index + self.block_size, self.n_lines)
+        if self.addresses_by_type is None:
+            self.data[block_index:end] = data[: end - block_index]
+            if self.dirty is not None:
+                self.dirty.update(range(block_index, end))
+            return
+
+        for i in range(block_index, end):
+            self.set_line(i, data[i - block_index], count=False)
+
+    def apply_writes(self, writes: dict[int, BloodType]) -> None:
+        # Bulk-apply single-line writes, bypassing the caches (used for log replay)
+        if writes and max(writes) >= self.n_lines:
+            raise IndexError("Line number exceeds the total number of lines.")
+
+        for address, value in writes.items():
+            self.set_line(address, value)
+            self.bump_version(address)
+
+    def set_line(self, address, value, count=True) -> None:
+        # Store a single line, keeping the dirty set, inventory and type index current
+        old = self.data[address]
+        if count:
+            self.record_update(old, value)
+        if self.addresses_by_type is not None:
+            if old is not None:
+                self.addresses_by_type[old].discard(address)
+            if value is not None:
+                self.addresses_by_type[value].add(address)
+        self.data[address] = value
+        if self.dirty is not None:
+            self.dirty.add(address)
+
+    def record_update(self, previous, value) -> None:
+        # Update the inventory for a bag replaced here or in a cache
+        count_replacement(self.inventory, previous, value)
+
+    def load(self, data: list[BloodType | None], inventory=None) -> None:
+        # Replace the whole memory contents at once (used for snapshot restore);
+        # `inventory` may be given when the caller already knows the counts
+        if len(data) != self.n_lines:
+            raise ValueError("Data size does not match the number of lines.")
+
+        self.data = data
+        self.inventory = inventory or [data.count(t) for t in BloodType]
+        self.addresses_by_type = None
+
+    def type_index(self) -> dict[BloodType, set[int]]:
+        # Addresses holding each blood type, kept up to date by every write
+        if self.addresses_by_type is None:
+            self.addresses_by_type = {t: set() for t in BloodType}
+            for address, value in enumerate(self.data):
+                if value is not None:
+                    self.addresses_by_type[value].add(address)
+        return self.addresses_by_type
+
+    def block_version(self, address) -> int:
+        return self.versions[address // self.block_size]
+
+    def bump_version(self, address) -> int:
+        # Record an update to the block holding the address
+        block = address // self.block_size
+        self.versions[block] += 1
+        return self.versions[block]
+
+    def track_changes(self, enabled=True) -> None:
+        # Start recording written addresses for take_dirty, or stop recording
+        self.dirty = set() if enabled else None
+
+    def take_dirty(self) -> set[int]:
+        # Return the addresses written since the last call and start a new set
+        if self.dirty is None:
+            raise RuntimeError("Change tracking is off; call track_changes first.")
+        dirty, self.dirty = self.dirty, set()
+        return dirty
 
     def __str__(self) -> str:
         blocks = [
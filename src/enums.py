@@ -1,4 +1,5 @@
 from enum import Enum
+from functools import cached_property
 
 
 class MESITag(Enum):
@@ -19,6 +20,13 @@ class BloodType(Enum):
     O_NEGATIVE = "O-"
     EMPTY = "E"
 
+    @cached_property
+    def code(self) -> int:
+        # Compact code (the declaration index) used to index per-type lists and in
+        # the binary log and snapshots. Cached on the member after the first use,
+        # so hot paths pay a plain attribute lookup instead of hashing the member
+        return BLOOD_TYPES_BY_CODE.index(self)
+
     def __str__(self) -> str:
         if len(self.value) < 2:
             return self.value + "  "
@@ -37,3 +45,7 @@ class SnoopResponse(Enum):
     OK = "ok"
     SHARED = "shared"
     INVALID = "invalid"
+
+
+# Blood types indexed by BloodType.code, for decoding
+BLOOD_TYPES_BY_CODE = list(BloodType)
@@ -0,0 +1,193 @@
+import json
+import math
+import sys
+import threading
+import time
+from collections import Counter
+
+
+# Values below this are recorded exactly; larger ones keep SIGNIFICANT_BITS bits
+SIGNIFICANT_BITS = 5
+EXACT_LIMIT = 1 << SIGNIFICANT_BITS
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in nanoseconds (about 3% resolution)."""
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}  # Bucket lower bound -> count
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value: int):
+        if value < EXACT_LIMIT:
+            bucket = value
+        else:
+            shift = value.bit_length() - SIGNIFICANT_BITS
+            bucket = (value >> shift) << shift
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> int:
+        """Upper bound of the bucket holding the given fraction of the samples."""
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(fraction * self.count))  # Nearest rank
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                shift = max(0, bucket.bit_length() - SIGNIFICANT_BITS)
+                return min(bucket + (1 << shift) - 1, self.max)  # type: ignore
+        return self.max  # type: ignore
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ns": round(self.total / self.count) if self.count else 0,
+            "min_ns": self.min or 0,
+            "p50_ns": self.percentile(0.50),
+            "p95_ns": self.percentile(0.95),
+            "p99_ns": self.percentile(0.99),
+            "max_ns": self.max or 0,
+        }
+
+
+class Instrumentation:
+    """Opt-in latency recording for blood bank operations and coherence phases.
+
+    Methods are timed by replacing them on the instrumented objects, so nothing
+    is paid while instrumentation is detached. The outermost timed call is an
+    operation; time spent in nested calls is added up per phase and recorded
+    under "<operation>/<phase>" once the operation finishes. Phase times are
+    inclusive (a cache read includes the bus broadcast it triggers) and only
+    recorded for operations that went through that phase.
+    """
+
+    def __init__(self):
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.attached = []  # (object, method name) pairs replaced by attach
+        self.operation = None  # Name of the operation in progress
+        self.phase_totals: dict[str, int] = {}
+        self.active: set[str] = set()  # Phases currently on the call stack
+
+        self.samples = Counter()  # Collapsed stacks seen by the sampling profiler
+        self.sampler = None
+        self.sampling = threading.Event()
+
+    def attach(self, obj, method_name: str, name: str):
+        """Times calls to `obj.method_name` under `name`."""
+        func = getattr(obj, method_name)
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            # Recursive calls of the same phase are already inside its timer
+            if name in self.active:
+                return func(*args, **kwargs)
+
+            outermost = self.operation is None
+            if outermost:
+                self.operation = name
+                self.phase_totals = {}
+            self.active.add(name)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                self.active.discard(name)
+                if outermost:
+                    self.operation = None
+                    self.record(name, elapsed)
+                    for phase, total in self.phase_totals.items():
+                        self.record(f"{name}/{phase}", total)
+                else:
+                    totals = self.phase_totals
+                    totals[name] = totals.get(name, 0) + elapsed
+
+        setattr(obj, method_name, timed)
+        self.attached.append((obj, method_name))
+
+    def detach(self):
+        """Restores every method replaced by attach."""
+        for obj, method_name in reversed(self.attached):
+            obj.__dict__.pop(method_name, None)
+        self.attached = []
+
+    def record(self, name: str, elapsed_ns: int):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(elapsed_ns)
+
+    def percentiles(self, name: str) -> dict:
+        """Latency summary (count, mean, p50/p95/p99, max) of an operation or phase."""
+        if name not in self.histograms:
+            return LatencyHistogram().summary()
+        return self.histograms[name].summary()
+
+    def summary(self) -> dict:
+        return {
+            name: histogram.summary()
+            for name, histogram in sorted(self.histograms.items())
+        }
+
+    def reset(self):
+        self.histograms = {}
+        self.samples = Counter()
+
+    def start_sampling(self, interval_ms=1.0):
+        """Samples the calling thread's stack every `interval_ms` in the background."""
+        if self.sampler is not None:
+            return
+        target = threading.get_ident()
+        self.sampling.set()
+        self.sampler = threading.Thread(
+            target=self._sample, args=(target, interval_ms / 1000), daemon=True
+        )
+        self.sampler.start()
+
+    def stop_sampling(self):
+        if self.sampler is None:
+            return
+        self.sampling.clear()
+        self.sampler.join()
+        self.sampler = None
+
+    def _sample(self, target, interval):
+        while self.sampling.is_set():
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+
+    def top_functions(self, limit=20) -> list[tuple[str, int]]:
+        """Functions most often found on top of the sampled stacks."""
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+    def to_dict(self) -> dict:
+        return {
+            "latencies": self.summary(),
+            "top_functions": self.top_functions(),
+            "samples": dict(self.samples),
+        }
+
+    def dump_json(self, path):
+        """Writes the latency summaries and profiler samples to a JSON file."""
+        with open(path, "w") as output:
+            json.dump(self.to_dict(), output, indent=2)
@@ -0,0 +1,248 @@
+import tkinter as tk
+from tkinter import ttk
+from bisect import bisect_left, insort
+
+from src.components import Cache, MainMemory
+from src.enums import BloodType, MESITag
+
+
+ALL_FILTER = "All"
+CACHED_FILTER = "In cache"
+TAG_FILTERS = {f"Tag {tag.value}": tag for tag in MESITag}
+TYPE_FILTERS = {str(blood_type).strip(): blood_type for blood_type in BloodType}
+
+
+class MemoryView:
+    """Virtualized main memory table that only materializes the visible rows.
+
+    The Treeview always holds `height` rows, which are relabeled as the view
+    scrolls, so its size and refresh time do not depend on the bank size.
+    Because rows are reused, the selection is tracked by address: whenever the
+    window or the filtered list changes, the selected address is reselected at
+    its new row, or the selection is cleared if the address is not shown.
+    """
+
+    def __init__(
+        self,
+        parent,
+        main_memory: MainMemory,
+        caches: list[Cache],
+        value_heading="Value",
+        height=40,
+        striped=False,
+        font=None,
+    ):
+        self.main_memory = main_memory
+        self.caches = caches
+        self.height = height
+        self.striped = striped
+
+        self.offset = 0  # Position of the first visible row
+        self.filter = ALL_FILTER
+        self.addresses = None  # Sorted filtered addresses, None when unfiltered
+
+        self.frame = tk.Frame(parent)
+
+        # Jump-to-address and filter controls
+        controls = tk.Frame(self.frame)
+        controls.grid(row=0, column=0, columnspan=2, sticky="we", pady=(0, 5))
+        self.jump_entry = tk.Entry(controls, width=7)
+        self.jump_entry.pack(side=tk.LEFT)
+        self.jump_entry.bind("<Return>", lambda event: self.jump_from_entry())
+        tk.Button(controls, text="Go", command=self.jump_from_entry).pack(
+            side=tk.LEFT, padx=(2, 5)
+        )
+        filter_options = [ALL_FILTER, *TYPE_FILTERS, CACHED_FILTER, *TAG_FILTERS]
+        self.filter_combobox = ttk.Combobox(
+            controls, values=filter_options, width=8, state="readonly"
+        )
+        self.filter_combobox.pack(side=tk.LEFT)
+        self.filter_combobox.current(0)
+        self.filter_combobox.bind(
+            "<<ComboboxSelected>>",
+            lambda event: self.set_filter(self.filter_combobox.get()),
+        )
+
+        self.table = ttk.Treeview(
+            self.frame, columns=("Col1", "Col2"), show="headings", height=height
+        )
+        self.table.heading("Col1", text="Address")
+        self.table.heading("Col2", text=value_heading)
+        self.table.column("Col1", width=80, anchor="center")
+        self.table.column("Col2", width=80, anchor="center")
+        self.table.grid(row=1, column=0, sticky="nswe")
+        self.table.tag_configure("lightgray", background="#d3d3d3")
+        if font:
+            self.table.tag_configure("fixed", font=font)
+
+        self.scrollbar = tk.Scrollbar(
+            self.frame, orient="vertical", command=self.yview
+        )
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.table.bind(sequence, self.on_mouse_wheel)
+
+        self.rows = [self.table.insert("", "end") for _ in range(height)]
+        self.render()
+
+    def total(self):
+        """Number of addresses matched by the current filter."""
+        if self.addresses is None:
+            return self.main_memory.n_lines
+        return len(self.addresses)
+
+    def address_at(self, position):
+        """Address shown at a position of the (filtered) list."""
+        if self.addresses is None:
+            return position
+        return self.addresses[position]
+
+    def position_of(self, address):
+        """Position of an address in the (filtered) list, or None if not listed."""
+        if self.addresses is None:
+            return address if 0 <= address < self.main_memory.n_lines else None
+        position = bisect_left(self.addresses, address)
+        if position < len(self.addresses) and self.addresses[position] == address:
+            return position
+        return None
+
+    def render(self):
+        """Relabels the materialized rows with the visible window of addresses."""
+        total = self.total()
+        data = self.main_memory.data
+        for i, row in enumerate(self.rows):
+            position = self.offset + i
+            if position >= total:
+                self.table.item(row, values=("", ""), tags=())
+                continue
+
+            address = self.address_at(position)
+            tag = "fixed"
+            if self.striped and (address // self.main_memory.block_size) % 2:
+                tag = "lightgray"
+            self.table.item(row, values=(address, data[address]), tags=(tag,))
+
+        if total:
+            self.scrollbar.set(
+                self.offset / total, min(self.offset + self.height, total) / total
+            )
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, position):
+        """Moves the window so that it starts at the given position."""
+        self.show(position, self.selected_address())
+
+    def show(self, position, selected):
+        """Renders the window starting at `position` and reselects `selected`.
+
+        `selected` must be read before the filtered list changes, since the rows
+        still show the old window until they are relabeled.
+        """
+        self.offset = max(0, min(position, self.total() - self.height))
+        self.render()
+
+        self.table.selection_remove(*self.table.selection())
+        position = None if selected is None else self.position_of(selected)
+        if position is not None and 0 <= position - self.offset < self.height:
+            row = self.rows[position - self.offset]
+            self.table.selection_set(row)
+            self.table.focus(row)
+
+    def yview(self, *args):
+        """Scrollbar callback, following the Tk yview protocol."""
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total()))
+        elif args[0] == "scroll":
+            step = self.height if args[2] == "pages" else 1
+            self.scroll_to(self.offset + int(args[1]) * step)
+
+    def on_mouse_wheel(self, event):
+        """Scrolls the window with the mouse wheel."""
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - 3)
+        else:
+            self.scroll_to(self.offset + 3)
+        return "break"
+
+    def jump_from_entry(self):
+        """Jumps to the address typed in the jump entry."""
+        address_raw = self.jump_entry.get().strip()
+        if address_raw.isdigit():
+            self.jump_to(int(address_raw))
+
+    def jump_to(self, address):
+        """Scrolls to an address (or the next match) and selects its row."""
+        if self.addresses is None:
+            position = min(address, self.main_memory.n_lines - 1)
+        else:
+            position = bisect_left(self.addresses, address)
+        selected = self.address_at(position) if position < self.total() else None
+        self.show(position, selected)
+
+    def set_filter(self, name):
+        """Shows only the addresses matching a blood type or MESI presence filter."""
+        selected = self.selected_address()
+        self.filter = name
+        self.addresses = self.filtered_addresses()
+
+        # Keep a selected bag that passes the filter in view, otherwise start over
+        position = None if selected is None else self.position_of(selected)
+        self.show(0 if position is None else position, selected)
+
+    def filtered_addresses(self):
+        """Sorted addresses matching the current filter, from the in-memory indexes."""
+        if self.filter in TYPE_FILTERS:
+            return sorted(self.main_memory.type_index()[TYPE_FILTERS[self.filter]])
+        if self.filter == CACHED_FILTER or self.filter in TAG_FILTERS:
+            return sorted(self.cached_addresses(TAG_FILTERS.get(self.filter)))
+        return None
+
+    def cached_addresses(self, tag=None):
+        """Addresses held by any cache, optionally only in blocks with a given tag."""
+        addresses = set()
+        n_lines = self.main_memory.n_lines
+        for cache in self.caches:
+            for block_index, block in cache.data.items():
+                if tag is None or block.tag == tag:
+                    end = min(block_index + cache.block_size, n_lines)
+                    addresses.update(range(block_index, end))
+        return addresses
+
+    def refresh(self, dirty):
+        """Updates the view after the addresses in `dirty` were written."""
+        selected = self.selected_address()
+        if self.filter in TYPE_FILTERS:
+            blood_type = TYPE_FILTERS[self.filter]
+            for address in dirty:
+                position = bisect_left(self.addresses, address)
+                listed = (
+                    position < len(self.addresses)
+                    and self.addresses[position] == address
+                )
+                matches = self.main_memory.data[address] == blood_type
+                if matches and not listed:
+                    insort(self.addresses, address)
+                elif listed and not matches:
+                    del self.addresses[position]
+        elif self.addresses is not None:
+            # Cache contents change on almost every action and are small
+            self.addresses = self.filtered_addresses()
+
+        offset = self.offset
+        position = None if selected is None else self.position_of(selected)
+        if position is not None:
+            # Keep the selected bag on screen when rows before it come or go
+            offset = min(max(offset, position - self.height + 1), position)
+        self.show(offset, selected)
+
+    def selected_address(self):
+        """Address of the selected row, or None if no bag is selected."""
+        selection = self.table.selection()
+        if not selection:
+            return None
+        position = self.offset + self.rows.index(selection[0])
+        if position >= self.total():
+            return None
+        return self.address_at(position)
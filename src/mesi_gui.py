@@ -5,6 +5,7 @@ import sys
 
 from src.enums import BloodType
 from src.mesi_simulator import MESISimulator
+from src.memory_view import MemoryView
 
 
 class ConsoleOutput:
@@ -29,6 +30,8 @@ class MESISimulatorGUI:
         self.BLOCK_SIZE = simulator.main_memory.block_size
 
         self.tables = []
+        self.memory_view = None
+        self.cache_rows = []  # Row ids of each cache table, by block address
         self.processor_map = {}
         for i in range(len(self.caches)):
             self.processor_map[f"Processor {i + 1}"] = i
@@ -38,27 +41,55 @@ class MESISimulatorGUI:
 
         self.setup_ui()
 
-    def refresh_tables(self):
-        for table in self.tables:
-            for item in table.get_children():
-                table.delete(item)
+    def rebuild_tables(self):
+        for table in self.tables[1:]:
+            table.delete(*table.get_children())
 
-        for i in range(self.MAIN_MEMORY_SIZE):
-            self.tables[0].insert("", "end", values=(i, self.main_memory.data[i]))
+        self.main_memory.track_changes()
+        self.memory_view.render()
 
-        for i in range(1, len(self.caches) + 1):
-            for addr in reversed(self.caches[i - 1].queue):
-                data = " | ".join([str(v) for v in self.caches[i - 1].data[addr].data])
-                self.tables[i].insert(
+        self.cache_rows = [{} for _ in self.caches]
+        for i, cache in enumerate(self.caches):
+            for addr in reversed(cache.queue):
+                self.cache_rows[i][addr] = self.tables[i + 1].insert(
                     "",
                     "end",
-                    values=(
-                        addr,
-                        data,
-                        self.caches[i - 1].data[addr].tag.value,
-                    ),
+                    values=self.cache_row_values(cache, addr),
                     tags=("fixed",),
                 )
+            cache.track_changes()
+
+    # Update only the rows whose data changed since the last refresh
+    def refresh_tables(self):
+        self.memory_view.refresh(self.main_memory.take_dirty())
+
+        for i, cache in enumerate(self.caches):
+            changed = cache.take_dirty()
+            if not changed:
+                continue
+
+            table = self.tables[i + 1]
+            rows = self.cache_rows[i]
+            for addr in changed:
+                if addr not in cache.data:
+                    if addr in rows:
+                        table.delete(rows.pop(addr))
+                elif addr in rows:
+                    table.item(rows[addr], values=self.cache_row_values(cache, addr))
+                else:
+                    rows[addr] = table.insert(
+                        "",
+                        0,
+                        values=self.cache_row_values(cache, addr),
+                        tags=("fixed",),
+                    )
+
+            # Keep the newest blocks on top, as in the FIFO queue
+            table.set_children("", *[rows[addr] for addr in reversed(cache.queue)])
+
+    def cache_row_values(self, cache, addr):
+        block = cache.data[addr]
+        return (addr, " | ".join([str(v) for v in block.data]), block.tag.value)
 
     def write_address(self):
         address_raw = self.address_entry.get()
@@ -150,25 +181,19 @@ class MESISimulatorGUI:
         table_label = tk.Label(table_frame, text="Main Memory")
         table_label.grid(row=0, column=0, sticky="n", padx=(15, 0))
 
-        table = ttk.Treeview(
-            table_frame, columns=("Col1", "Col2"), show="headings", height=40
+        self.memory_view = MemoryView(
+            table_frame, self.main_memory, self.caches, height=38, font=fixed_font
         )
-        table.heading("Col1", text="Address")
-        table.heading("Col2", text="Value")
-        table.column("Col1", width=80, anchor="center")
-        table.column("Col2", width=80, anchor="center")
-        table.grid(
-            row=0, column=0, rowspan=2, sticky="nswe", padx=(10, 0), pady=(25, 5)
-        )
-        table.tag_configure("fixed", font=fixed_font)
-
-        scrollbar = tk.Scrollbar(table_frame, orient="vertical", command=table.yview)
-        scrollbar.grid(
-            row=0, column=1, rowspan=2, padx=(0, 5), pady=(25, 5), sticky="ns"
+        self.memory_view.frame.grid(
+            row=0,
+            column=0,
+            columnspan=2,
+            rowspan=2,
+            sticky="nswe",
+            padx=(10, 5),
+            pady=(25, 5),
         )
-
-        table.configure(yscrollcommand=scrollbar.set)
-        self.tables.append(table)
+        self.tables.append(self.memory_view.table)
 
         for i in range(len(self.caches)):
             cache_table_label = tk.Label(table_frame, text=f"Processor {i + 1}")
@@ -189,7 +214,7 @@ class MESISimulatorGUI:
             )
             self.tables.append(cache_table)
 
-        self.refresh_tables()
+        self.rebuild_tables()
 
         console_label = tk.Label(table_frame, text="Output")
         console_label.grid(row=0, column=len(self.caches), sticky="n")
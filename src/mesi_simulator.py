@@ -1,7 +1,12 @@
 import random
+import struct
+import sys
+from array import array
 
 from src.components import Cache, MainMemory, Bus
-from src.enums import BloodType
+from src.components.cache import CacheBlock
+from src.enums import BloodType, MESITag, BLOOD_TYPES_BY_CODE
+from src.instrumentation import Instrumentation
 
 
 # Constants
@@ -13,6 +18,66 @@ BLOCK_SIZE = 5
 if MAIN_MEMORY_SIZE % BLOCK_SIZE != 0:
     raise ValueError("The main memory size must be divisible by the block size!")
 
+# Binary snapshot layout: header, main memory line codes and block versions,
+# bus counters, then for each cache its block count, FIFO queue (block indexes),
+# tag codes, block versions, block line codes and counters. Counters are stored
+# in the order of the `stats` dicts, which is fixed by the constructors.
+SNAPSHOT_MAGIC = b"MESISNAP"
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEADER = struct.Struct("<8sHIIII")
+CACHE_HEADER = struct.Struct("<I")
+
+EMPTY_LINE_CODE = 255  # Code for lines that were never written (None)
+LINE_CODES = {**{t: t.code for t in BloodType}, None: EMPTY_LINE_CODE}
+VALID_LINE_CODES = bytes(LINE_CODES.values())
+# Decoding table indexed by byte; only VALID_LINE_CODES entries are meaningful
+LINES_BY_CODE = tuple(
+    BLOOD_TYPES_BY_CODE[code] if code < len(BLOOD_TYPES_BY_CODE) else None
+    for code in range(256)
+)
+TAGS = list(MESITag)
+TAG_CODES = {tag: code for code, tag in enumerate(TAGS)}
+VALID_TAG_CODES = bytes(TAG_CODES.values())
+
+
+def pack_array(typecode, values) -> bytes:
+    # Little-endian bytes of an array of integers
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def decode_lines(codes: bytes) -> list[BloodType | None]:
+    # Line values of a run of line codes, rejecting codes that were never written
+    if codes.translate(None, VALID_LINE_CODES):
+        raise ValueError("Unknown line code in simulator snapshot.")
+    return list(map(LINES_BY_CODE.__getitem__, codes))
+
+
+def check_length(raw, end):
+    # Snapshots are read front to back, so running past the end means truncation
+    if end > len(raw):
+        raise ValueError("Truncated simulator snapshot.")
+
+
+def unpack_array(typecode, raw, offset, count) -> tuple[list[int], int]:
+    # Read `count` integers written by pack_array, returning them and the new offset
+    unpacked = array(typecode)
+    end = offset + count * unpacked.itemsize
+    check_length(raw, end)
+    unpacked.frombytes(raw[offset:end])
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked.tolist(), end
+
+
+def load_stats(stats, raw, offset) -> int:
+    # Overwrite the counters of a `stats` dict in place, returning the new offset
+    values, offset = unpack_array("Q", raw, offset, len(stats))
+    stats.update(zip(stats, values))
+    return offset
+
 
 class MESISimulator:
     def __init__(
@@ -25,6 +90,10 @@ class MESISimulator:
         for cache in self.caches:
             self.bus.attach_cache(cache)
 
+        self.cache_size = cache_size
+        self.block_size = block_size
+        self.instrumentation: Instrumentation | None = None
+
     def populate_main_memory(self):
         # Populate main memory with random data
         for i in range(0, MAIN_MEMORY_SIZE, BLOCK_SIZE):
@@ -36,3 +105,155 @@ class MESISimulator:
         for cache in self.caches:
             while cache.current_lines < cache.max_lines:
                 cache.read(random.randint(0, MAIN_MEMORY_SIZE - 1))
+
+    def current_contents(self) -> list[BloodType | None]:
+        # Main memory as the program sees it: Modified cache lines override it
+        contents = list(self.main_memory.data)
+        n_lines = len(contents)
+        for cache in self.caches:
+            for block_index, block in cache.data.items():
+                if block.tag == MESITag.M:
+                    end = min(block_index + self.block_size, n_lines)
+                    contents[block_index:end] = block.data[: end - block_index]
+        return contents
+
+    def enable_instrumentation(
+        self, instrumentation: Instrumentation | None = None
+    ) -> Instrumentation:
+        # Time cache accesses, bus broadcasts and main memory traffic
+        if self.instrumentation is not None:
+            return self.instrumentation
+
+        self.instrumentation = instrumentation or Instrumentation()
+        for cache in self.caches:
+            self.instrumentation.attach(cache, "read", "cache.read")
+            self.instrumentation.attach(cache, "write", "cache.write")
+        self.instrumentation.attach(self.bus, "broadcast", "bus.broadcast")
+        self.instrumentation.attach(self.bus, "read_from_main", "main_memory.read")
+        self.instrumentation.attach(self.bus, "write_back", "main_memory.write")
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        if self.instrumentation is not None:
+            self.instrumentation.detach()
+            self.instrumentation = None
+
+    def to_bytes(self) -> bytes:
+        # Serialize main memory and every cache into a compact binary snapshot
+        encode = LINE_CODES.__getitem__
+        parts = [
+            SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_VERSION,
+                self.main_memory.n_lines,
+                self.block_size,
+                len(self.caches),
+                self.cache_size,
+            ),
+            bytes(map(encode, self.main_memory.data)),
+            pack_array("Q", self.main_memory.versions),
+            pack_array("Q", self.bus.stats.values()),
+        ]
+
+        for cache in self.caches:
+            blocks = [cache.data[addr] for addr in cache.queue]
+            lines = []
+            for block in blocks:
+                # Pad a short trailing block so every block has block_size lines
+                lines.extend(block.data)
+                lines.extend([None] * (self.block_size - len(block.data)))
+
+            parts.append(CACHE_HEADER.pack(len(blocks)))
+            parts.append(pack_array("I", cache.queue))
+            parts.append(bytes(TAG_CODES[block.tag] for block in blocks))
+            parts.append(pack_array("Q", [block.version for block in blocks]))
+            parts.append(bytes(map(encode, lines)))
+            parts.append(pack_array("Q", cache.stats.values()))
+
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "MESISimulator":
+        # Rebuild a simulator from a snapshot created by to_bytes
+        check_length(raw, SNAPSHOT_HEADER.size)
+        magic, version, memory_size, block_size, n_caches, cache_size = (
+            SNAPSHOT_HEADER.unpack_from(raw)
+        )
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported simulator snapshot.")
+        if block_size == 0:
+            raise ValueError("Invalid block size in simulator snapshot.")
+        # Every line and cache takes some bytes, so a corrupt header cannot make
+        # us allocate more than the snapshot could describe
+        minimum = SNAPSHOT_HEADER.size + memory_size + n_caches * CACHE_HEADER.size
+        check_length(raw, minimum)
+
+        simulator = cls(memory_size, cache_size, n_caches, block_size)
+        offset = SNAPSHOT_HEADER.size
+
+        check_length(raw, offset + memory_size)
+        memory = raw[offset : offset + memory_size]
+        inventory = [memory.count(t.code) for t in BloodType]
+        simulator.main_memory.load(decode_lines(memory), inventory)
+        offset += memory_size
+        simulator.main_memory.versions, offset = unpack_array(
+            "Q", raw, offset, len(simulator.main_memory.versions)
+        )
+        offset = load_stats(simulator.bus.stats, raw, offset)
+
+        for cache in simulator.caches:
+            check_length(raw, offset + CACHE_HEADER.size)
+            (n_blocks,) = CACHE_HEADER.unpack_from(raw, offset)
+            offset += CACHE_HEADER.size
+            if n_blocks > cache_size:
+                raise ValueError("Cache holds more blocks than its size in snapshot.")
+
+            queue, offset = unpack_array("I", raw, offset, n_blocks)
+            if len(set(queue)) != n_blocks or any(
+                addr >= memory_size or addr % block_size for addr in queue
+            ):
+                raise ValueError("Invalid block address in simulator snapshot.")
+
+            check_length(raw, offset + n_blocks)
+            tags = raw[offset : offset + n_blocks]
+            if tags.translate(None, VALID_TAG_CODES):
+                raise ValueError("Unknown MESI tag code in simulator snapshot.")
+            offset += n_blocks
+
+            versions, offset = unpack_array("Q", raw, offset, n_blocks)
+
+            check_length(raw, offset + n_blocks * block_size)
+            lines = decode_lines(raw[offset : offset + n_blocks * block_size])
+            offset += n_blocks * block_size
+            offset = load_stats(cache.stats, raw, offset)
+
+            cache.queue = queue
+            cache.data = {
+                addr: CacheBlock(
+                    TAGS[tag], lines[i * block_size : (i + 1) * block_size], version
+                )
+                for i, (addr, tag, version) in enumerate(zip(queue, tags, versions))
+            }
+            cache.current_lines = n_blocks
+            cache.recount()
+
+        if offset != len(raw):
+            raise ValueError("Simulator snapshot has trailing data.")
+
+        simulator.bus.recount_inventory()
+        return simulator
+
+    def save_snapshot(self, path):
+        # Write a binary checkpoint of the full simulator state
+        with open(path, "wb") as snapshot:
+            snapshot.write(self.to_bytes())
+
+    @classmethod
+    def load_snapshot(cls, path) -> "MESISimulator":
+        # Restore a simulator from a checkpoint written by save_snapshot
+        with open(path, "rb") as snapshot:
+            return cls.from_bytes(snapshot.read())
+
+    def fork(self) -> "MESISimulator":
+        # Independent copy of the current state, for branching experiments
+        return self.from_bytes(self.to_bytes())
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from src.enums import BloodType
+from src.mesi_simulator import (
+    CACHE_HEADER,
+    SNAPSHOT_HEADER,
+    MESISimulator,
+    TAGS,
+)
+
+
+def busy_simulator(seed=0):
+    """A simulator whose caches hold blocks in every MESI state."""
+    random.seed(seed)
+    simulator = MESISimulator()
+    simulator.populate_main_memory()
+    for cache in simulator.caches:
+        cache.verbose = False
+    simulator.populate_caches()
+
+    rng = random.Random(seed)
+    blood_types = list(BloodType)
+    for _ in range(300):
+        cache = rng.choice(simulator.caches)
+        if rng.random() < 0.4:
+            cache.write(rng.randrange(200), rng.choice(blood_types))
+        else:
+            cache.read(rng.randrange(200))
+    return simulator
+
+
+def test_round_trip_keeps_state_and_counters(tmp_path):
+    simulator = busy_simulator()
+    path = tmp_path / "state.snap"
+    simulator.save_snapshot(path)
+    restored = MESISimulator.load_snapshot(path)
+
+    assert restored.to_bytes() == simulator.to_bytes()
+    assert restored.main_memory.data == simulator.main_memory.data
+    assert restored.main_memory.versions == simulator.main_memory.versions
+    assert restored.main_memory.inventory == simulator.main_memory.inventory
+    assert restored.bus.stats == simulator.bus.stats
+    for original, copy in zip(simulator.caches, restored.caches):
+        assert copy.queue == original.queue
+        assert copy.stats == original.stats
+        assert copy.counts == original.counts
+        for address, block in original.data.items():
+            assert copy.data[address].tag == block.tag
+            assert copy.data[address].data == block.data
+            assert copy.data[address].version == block.version
+
+
+def test_fork_is_independent():
+    simulator = busy_simulator()
+    fork = simulator.fork()
+    fork.caches[0].write(0, BloodType.EMPTY)
+
+    assert fork.to_bytes() != simulator.to_bytes()
+    assert simulator.fork().to_bytes() == simulator.to_bytes()
+
+
+def test_truncated_snapshot_is_rejected():
+    raw = busy_simulator().to_bytes()
+    for length in range(0, len(raw), 7):
+        with pytest.raises(ValueError):
+            MESISimulator.from_bytes(raw[:length])
+    with pytest.raises(ValueError):
+        MESISimulator.from_bytes(raw[:-1])
+
+
+def test_trailing_data_is_rejected():
+    raw = busy_simulator().to_bytes()
+    with pytest.raises(ValueError):
+        MESISimulator.from_bytes(raw + b"\0")
+
+
+def test_unknown_codes_are_rejected():
+    simulator = busy_simulator()
+    raw = simulator.to_bytes()
+
+    memory_code = bytearray(raw)
+    memory_code[SNAPSHOT_HEADER.size] = 100
+    with pytest.raises(ValueError):
+        MESISimulator.from_bytes(bytes(memory_code))
+
+    # The first cache's tag codes follow its header and its queue
+    n_blocks = len(simulator.caches[0].queue)
+    first_cache = (
+        SNAPSHOT_HEADER.size
+        + simulator.main_memory.n_lines
+        + 8 * len(simulator.main_memory.versions)
+        + 8 * len(simulator.bus.stats)
+    )
+    assert CACHE_HEADER.unpack_from(raw, first_cache) == (n_blocks,)
+    tag_code = bytearray(raw)
+    tag_code[first_cache + CACHE_HEADER.size + 4 * n_blocks] = len(TAGS)
+    with pytest.raises(ValueError):
+        MESISimulator.from_bytes(bytes(tag_code))
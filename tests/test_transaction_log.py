@@ -0,0 +1,159 @@
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from src.blood_bank.BloodBank import BloodBank
+from src.blood_bank.TransactionLog import (
+    LOG_HEADER,
+    BASE_HEADER,
+    RECORD,
+    OP_DONATE,
+    TransactionLog,
+    open_transaction_log,
+)
+from src.components import MainMemory
+from src.enums import BloodType
+from src.mesi_simulator import MESISimulator
+
+
+def open_bank(path, seed, **group_commit):
+    """Recovers (or creates) a bank from the log at `path`, as main.py would."""
+    random.seed(seed)
+    simulator = MESISimulator()
+    simulator.populate_main_memory()
+    log = open_transaction_log(path, simulator.main_memory, **group_commit)
+    for cache in simulator.caches:
+        cache.verbose = False
+    simulator.populate_caches()
+    return simulator, log, BloodBank(simulator, log)
+
+
+def replayed(path, n_lines=200):
+    memory = MainMemory(n_lines, 5)
+    TransactionLog.replay(path, memory)
+    return memory.data
+
+
+def test_replay_after_crash_restores_acknowledged_operations(tmp_path):
+    path = tmp_path / "bank.wal"
+    simulator, log, bank = open_bank(path, seed=1)
+
+    for hospital_id in range(4):
+        assert bank.donate_blood(hospital_id, "AB-").startswith("Blood accepted")
+    bag = next(
+        address
+        for address, value in enumerate(simulator.current_contents())
+        if value not in (None, BloodType.EMPTY)
+    )
+    value = simulator.current_contents()[bag].value
+    assert bank.use_blood(0, bag, value) == "Transaction successful."
+    expected = simulator.current_contents()
+
+    # Crash: the log is never closed and Modified cache lines are lost. A
+    # different seed shows that recovery does not depend on populate_main_memory
+    recovered, recovered_log, _ = open_bank(path, seed=2)
+    assert recovered.current_contents() == expected
+
+    recovered_log.close()
+    log.close()
+
+
+def test_torn_record_is_ignored_and_truncated(tmp_path):
+    path = tmp_path / "bank.wal"
+    with TransactionLog(path) as log:
+        log.wait_durable(log.log_donation(0, 3, BloodType.O_NEGATIVE))
+    with open(path, "ab") as raw:
+        raw.write(RECORD.pack(OP_DONATE, 0, 4, BloodType.A_POSITIVE.code)[:3])
+
+    assert replayed(path)[3:5] == [BloodType.O_NEGATIVE, None]
+
+    # Reopening drops the torn bytes, so the next record stays aligned
+    with TransactionLog(path) as log:
+        assert log.records == 1
+        log.wait_durable(log.log_donation(1, 5, BloodType.B_POSITIVE))
+    assert replayed(path)[3:6] == [BloodType.O_NEGATIVE, None, BloodType.B_POSITIVE]
+
+
+def test_checkpoint_replaces_records_with_base_image(tmp_path):
+    path = tmp_path / "bank.wal"
+    simulator, log, bank = open_bank(path, seed=3)
+    for _ in range(10):
+        bank.donate_blood(1, "O+")
+    assert log.records > 0
+
+    bank.checkpoint()
+    assert log.records == 0
+    assert os.path.getsize(path) == len(LOG_HEADER) + BASE_HEADER.size + 200
+    assert not os.path.exists(f"{path}.tmp")
+    assert replayed(path) == simulator.current_contents()
+
+    # Records after the checkpoint are replayed on top of the new base image
+    bank.donate_blood(2, "B-")
+    assert replayed(path) == simulator.current_contents()
+    log.close()
+
+
+def test_interrupted_checkpoint_keeps_old_log(tmp_path):
+    path = tmp_path / "bank.wal"
+    simulator, log, bank = open_bank(path, seed=4)
+    bank.donate_blood(0, "A-")
+    expected = simulator.current_contents()
+
+    # A crash before the rename leaves a partial image next to the log
+    with open(f"{path}.tmp", "wb") as partial:
+        partial.write(LOG_HEADER + BASE_HEADER.pack(200))
+
+    recovered, recovered_log, _ = open_bank(path, seed=5)
+    assert recovered.current_contents() == expected
+    recovered_log.close()
+    log.close()
+
+
+def test_unknown_blood_type_code_is_rejected(tmp_path):
+    path = tmp_path / "bank.wal"
+    TransactionLog(path).close()
+    with open(path, "ab") as raw:
+        raw.write(RECORD.pack(OP_DONATE, 0, 1, 200))
+
+    with pytest.raises(ValueError):
+        replayed(path)
+
+
+def test_lone_operation_does_not_wait_for_group(tmp_path):
+    _, log, bank = open_bank(tmp_path / "bank.wal", seed=6, group_commit_ms=1000)
+
+    start = time.monotonic()
+    bank.donate_blood(0, "A+")
+    assert time.monotonic() - start < 0.5
+    assert log.durable == log.written
+    log.close()
+
+
+def test_concurrent_appends_share_fsyncs(tmp_path, monkeypatch):
+    fsyncs = []
+    real_fsync = os.fsync
+
+    def slow_fsync(fd):
+        fsyncs.append(fd)
+        time.sleep(0.002)
+        real_fsync(fd)
+
+    log = TransactionLog(tmp_path / "bank.wal", group_commit_ms=5)
+    monkeypatch.setattr(os, "fsync", slow_fsync)
+
+    def hospital(hospital_id):
+        for address in range(20):
+            log.wait_durable(log.log_use(hospital_id, address))
+
+    threads = [threading.Thread(target=hospital, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert log.durable == log.written == 160
+    assert len(fsyncs) < 80
+    log.close()